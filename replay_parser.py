@@ -1,26 +1,13 @@
 ﻿import argparse
+import io
 import json
-import re
-from dataclasses import dataclass
+import sys
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
 #python replay_parser.py "Gen9VGC2026RegFBo3-2026-02-07-jagsamurott-spurrific.html" -o parsed_output.json
 
-
-@dataclass
-class TeamPokemon:
-    name: str
-    item: str | None
-    ability: str | None
-    moves: list[str]
-    tera_type: str | None
-
-
-def _extract_player(slot: str) -> str:
-    side = slot.split(":", 1)[0].strip()
-    if side.startswith("p1"):
-        return "p1"
-    if side.startswith("p2"):
-        return "p2"
-    return side
+_BO3_HREF_PREFIX = 'href="'
+_BO3_PATH_PREFIX = "/game-bestof3-"
 
 
 def _extract_species_from_details(details: str) -> str:
@@ -29,14 +16,71 @@ def _extract_species_from_details(details: str) -> str:
 
 def _normalize_species(species: str) -> str:
     if species.endswith("-Tera"):
-        return species[: -len("-Tera")]
-    return species
+        species = species[: -len("-Tera")]
+    return sys.intern(species)
 
 
-def _extract_nickname(slot: str) -> str | None:
-    if ":" not in slot:
-        return None
-    return slot.split(":", 1)[1].strip()
+def _extract_player_nickname(slot: str) -> tuple[str, str | None]:
+    side, sep, nickname = slot.partition(":")
+    if side.startswith("p1"):
+        player = "p1"
+    elif side.startswith("p2"):
+        player = "p2"
+    else:
+        player = side.strip()
+    if not sep:
+        return player, None
+    return player, sys.intern(nickname.strip())
+
+
+def _find_game_number(html: str) -> int | None:
+    # Equivalent to re.search(r"Game\s+(\d+)", html) without the regex engine.
+    start = html.find("Game")
+    while start != -1:
+        pos = start + len("Game")
+        end = len(html)
+        while pos < end and html[pos].isspace():
+            pos += 1
+        digits_start = pos
+        while pos < end and html[pos].isdecimal():
+            pos += 1
+        if pos > digits_start > start + len("Game"):
+            return int(html[digits_start:pos])
+        start = html.find("Game", start + 1)
+    return None
+
+
+def _split_bo3_id(value: str) -> str | None:
+    # Shortest "<slug>-<digits>" prefix, optionally followed by a "-<suffix>" without "/".
+    dash = value.find("-")
+    while dash != -1:
+        pos = dash + 1
+        while pos < len(value) and value[pos].isdecimal():
+            pos += 1
+        if pos > dash + 1:
+            rest = value[pos:]
+            if not rest or (rest[0] == "-" and len(rest) > 1 and "/" not in rest):
+                return value[:pos]
+        dash = value.find("-", dash + 1)
+    return None
+
+
+def _find_bo3_id(html: str) -> str | None:
+    # Equivalent to re.search(r'href="\\?/game-bestof3-([^"]*?-\d+)(?:-[^"/]+)?"', html).
+    start = html.find(_BO3_HREF_PREFIX)
+    while start != -1:
+        pos = start + len(_BO3_HREF_PREFIX)
+        if html.startswith("\\", pos):
+            pos += 1
+        if html.startswith(_BO3_PATH_PREFIX, pos):
+            pos += len(_BO3_PATH_PREFIX)
+            end = html.find('"', pos)
+            if end != -1:
+                bo3_id = _split_bo3_id(html[pos:end])
+                if bo3_id is not None:
+                    return bo3_id
+        start = html.find(_BO3_HREF_PREFIX, start + 1)
+    return None
 
 
 def _parse_showteam(raw: str) -> list[dict]:
@@ -45,7 +89,8 @@ def _parse_showteam(raw: str) -> list[dict]:
         member_raw = member_raw.strip()
         if not member_raw:
             continue
-        fields = member_raw.split("|")
+        # The tera type is the last field, so it is read from the unsplit remainder.
+        fields = member_raw.split("|", 5)
         if len(fields) < 6:
             continue
 
@@ -53,147 +98,187 @@ def _parse_showteam(raw: str) -> list[dict]:
         item = fields[2].strip() or None
         ability = fields[3].strip() or None
         moves_field = fields[4].strip()
-        tera_type_raw = fields[-1].strip()
+        tera_type_raw = fields[5].rpartition("|")[2].strip()
         tera_type = tera_type_raw.lstrip(",") or None
-        moves = [m.strip() for m in moves_field.split(",") if m.strip()]
+        moves = list(filter(None, moves_field.split(",")))
 
         team.append(
-            TeamPokemon(
-                name=name,
-                item=item,
-                ability=ability,
-                moves=moves,
-                tera_type=tera_type,
-            ).__dict__
+            {
+                "name": name,
+                "item": item,
+                "ability": ability,
+                "moves": moves,
+                "tera_type": tera_type,
+            }
         )
     return team
 
 
-def parse_replay_log(log_text: str) -> dict:
-    p1_username = None
-    p2_username = None
-    p1_team = []
-    p2_team = []
-    p1_leads: list[str] = []
-    p2_leads: list[str] = []
-    p1_back: list[str] = []
-    p2_back: list[str] = []
+@dataclass
+class _ReplayState:
+    p1_username: str | None = None
+    p2_username: str | None = None
+    p1_team: list[dict] = field(default_factory=list)
+    p2_team: list[dict] = field(default_factory=list)
+    # Species switched in, in order with repeats; leads/back are derived at the end.
+    p1_switched: list[str] = field(default_factory=list)
+    p2_switched: list[str] = field(default_factory=list)
     p1_tera: str | None = None
     p2_tera: str | None = None
     winner: int | None = None
     best_of_3_id: str | None = None
     best_of_3_game_number: int | None = None
-    nickname_to_species = {"p1": {}, "p2": {}}
+    nickname_to_species: dict[str, dict[str, str]] = field(
+        default_factory=lambda: {"p1": {}, "p2": {}}
+    )
+
 
-    for line in log_text.splitlines():
-        line = line.strip()
-        if not line or not line.startswith("|"):
+def _on_player(parts: list[str], state: _ReplayState) -> None:
+    if len(parts) < 5:
+        return
+    slot = parts[2].strip()
+    username = parts[3].strip()
+    if not username:
+        return
+    if slot == "p1":
+        state.p1_username = username
+    elif slot == "p2":
+        state.p2_username = username
+
+
+def _on_uhtml(parts: list[str], state: _ReplayState) -> None:
+    if len(parts) < 4:
+        return
+    block_id = parts[2].strip()
+    if block_id != "bestof":
+        return
+
+    html = parts[3]
+    game_number = _find_game_number(html)
+    if game_number is not None:
+        state.best_of_3_game_number = game_number
+
+    bo3_id = _find_bo3_id(html)
+    if bo3_id is not None:
+        state.best_of_3_id = bo3_id
+
+
+def _on_showteam(parts: list[str], state: _ReplayState) -> None:
+    if len(parts) < 4:
+        return
+    slot = parts[2].strip()
+    payload = parts[3]
+    parsed_team = _parse_showteam(payload)
+    if slot == "p1":
+        state.p1_team = parsed_team
+    elif slot == "p2":
+        state.p2_team = parsed_team
+
+
+def _on_switch(parts: list[str], state: _ReplayState) -> None:
+    if len(parts) < 4:
+        return
+    slot = parts[2].strip()
+    details = parts[3].strip()
+    species = _normalize_species(_extract_species_from_details(details))
+    player, nickname = _extract_player_nickname(slot)
+    if nickname and player in state.nickname_to_species:
+        state.nickname_to_species[player][nickname] = species
+    if player == "p1":
+        state.p1_switched.append(species)
+    elif player == "p2":
+        state.p2_switched.append(species)
+
+
+def _on_detailschange(parts: list[str], state: _ReplayState) -> None:
+    if len(parts) < 4:
+        return
+    slot = parts[2].strip()
+    details = parts[3].strip()
+    species = _normalize_species(_extract_species_from_details(details))
+    player, nickname = _extract_player_nickname(slot)
+    if nickname and player in state.nickname_to_species:
+        state.nickname_to_species[player][nickname] = species
+
+
+def _on_terastallize(parts: list[str], state: _ReplayState) -> None:
+    if len(parts) < 3:
+        return
+    slot = parts[2].strip()
+    player, nickname = _extract_player_nickname(slot)
+    species = state.nickname_to_species.get(player, {}).get(nickname or "", nickname)
+    if player == "p1":
+        state.p1_tera = species
+    elif player == "p2":
+        state.p2_tera = species
+
+
+def _on_win(parts: list[str], state: _ReplayState) -> None:
+    if len(parts) < 3:
+        return
+    winner_name = parts[2].strip()
+    if state.p1_username and winner_name == state.p1_username:
+        state.winner = 1
+    elif state.p2_username and winner_name == state.p2_username:
+        state.winner = 2
+
+
+_EVENT_HANDLERS: dict[str, Callable[[list[str], _ReplayState], None]] = {
+    "player": _on_player,
+    "uhtml": _on_uhtml,
+    "showteam": _on_showteam,
+    "switch": _on_switch,
+    "detailschange": _on_detailschange,
+    "-terastallize": _on_terastallize,
+    "win": _on_win,
+}
+
+# Events whose fourth field is a free-form payload that may itself contain "|".
+_PAYLOAD_EVENTS = frozenset({"uhtml", "showteam"})
+
+
+def parse_replay_log(log: str | Iterable[str]) -> dict:
+    # Text is split the way a text-mode file is iterated so both inputs agree.
+    lines = io.StringIO(log, newline=None) if isinstance(log, str) else log
+    state = _ReplayState()
+
+    for line in lines:
+        if not line.startswith("|"):
             continue
 
-        parts = line.split("|")
-        if len(parts) < 2:
+        pipe = line.find("|", 1)
+        if pipe == -1:
             continue
-        event = parts[1]
-
-        if event == "player" and len(parts) >= 5:
-            slot = parts[2].strip()
-            username = parts[3].strip()
-            if not username:
-                continue
-            if slot == "p1":
-                p1_username = username
-            elif slot == "p2":
-                p2_username = username
-
-        elif event == "uhtml" and len(parts) >= 4:
-            block_id = parts[2].strip()
-            if block_id != "bestof":
-                continue
-
-            html = "|".join(parts[3:])
-            game_match = re.search(r"Game\s+(\d+)", html)
-            if game_match:
-                best_of_3_game_number = int(game_match.group(1))
-
-            id_match = re.search(
-                r'href="\\?/game-bestof3-([^"]*?-\d+)(?:-[^"/]+)?"',
-                html,
-            )
-            if id_match:
-                best_of_3_id = id_match.group(1)
-
-        elif event == "showteam" and len(parts) >= 4:
-            slot = parts[2].strip()
-            payload = "|".join(parts[3:])
-            parsed_team = _parse_showteam(payload)
-            if slot == "p1":
-                p1_team = parsed_team
-            elif slot == "p2":
-                p2_team = parsed_team
-
-        elif event == "switch" and len(parts) >= 4:
-            slot = parts[2].strip()
-            details = parts[3].strip()
-            species = _normalize_species(_extract_species_from_details(details))
-            player = _extract_player(slot)
-            nickname = _extract_nickname(slot)
-            if nickname and player in nickname_to_species:
-                nickname_to_species[player][nickname] = species
-            if player == "p1":
-                if species not in p1_leads and len(p1_leads) < 2:
-                    p1_leads.append(species)
-                elif species not in p1_leads and species not in p1_back:
-                    p1_back.append(species)
-            elif player == "p2":
-                if species not in p2_leads and len(p2_leads) < 2:
-                    p2_leads.append(species)
-                elif species not in p2_leads and species not in p2_back:
-                    p2_back.append(species)
-
-        elif event == "detailschange" and len(parts) >= 4:
-            slot = parts[2].strip()
-            details = parts[3].strip()
-            species = _normalize_species(_extract_species_from_details(details))
-            player = _extract_player(slot)
-            nickname = _extract_nickname(slot)
-            if nickname and player in nickname_to_species:
-                nickname_to_species[player][nickname] = species
-
-        elif event == "-terastallize" and len(parts) >= 3:
-            slot = parts[2].strip()
-            nickname = _extract_nickname(slot)
-            player = _extract_player(slot)
-            species = nickname_to_species.get(player, {}).get(nickname or "", nickname)
-            if player == "p1":
-                p1_tera = species
-            elif player == "p2":
-                p2_tera = species
-
-        elif event == "win" and len(parts) >= 3:
-            winner_name = parts[2].strip()
-            if p1_username and winner_name == p1_username:
-                winner = 1
-            elif p2_username and winner_name == p2_username:
-                winner = 2
+        event = line[1:pipe]
+        handler = _EVENT_HANDLERS.get(event)
+        if handler is None:
+            continue
+
+        parts = line.rstrip().split("|", 3 if event in _PAYLOAD_EVENTS else 4)
+        handler(parts, state)
+
+    # The first two distinct species are the leads; the rest came from the back.
+    p1_brought = list(dict.fromkeys(state.p1_switched))
+    p2_brought = list(dict.fromkeys(state.p2_switched))
 
     return {
-        "best_of_3_id": best_of_3_id,
-        "best_of_3_game_number": best_of_3_game_number,
+        "best_of_3_id": state.best_of_3_id,
+        "best_of_3_game_number": state.best_of_3_game_number,
         "player1": {
-            "username": p1_username,
-            "team": p1_team,
-            "lead_pokemon": p1_leads,
-            "back_pokemon": p1_back,
-            "terastalized_pokemon": p1_tera,
+            "username": state.p1_username,
+            "team": state.p1_team,
+            "lead_pokemon": p1_brought[:2],
+            "back_pokemon": p1_brought[2:],
+            "terastalized_pokemon": state.p1_tera,
         },
         "player2": {
-            "username": p2_username,
-            "team": p2_team,
-            "lead_pokemon": p2_leads,
-            "back_pokemon": p2_back,
-            "terastalized_pokemon": p2_tera,
+            "username": state.p2_username,
+            "team": state.p2_team,
+            "lead_pokemon": p2_brought[:2],
+            "back_pokemon": p2_brought[2:],
+            "terastalized_pokemon": state.p2_tera,
         },
-        "winning_player": winner,
+        "winning_player": state.winner,
     }
 
 
@@ -213,9 +298,8 @@ def main() -> None:
     args = parser.parse_args()
 
     with open(args.logfile, encoding="utf-8") as f:
-        log_text = f.read()
+        result = parse_replay_log(f)
 
-    result = parse_replay_log(log_text)
     output_json = json.dumps(result, indent=2)
     if args.output:
         with open(args.output, "w", encoding="utf-8") as f:
@@ -1,11 +1,28 @@
 ﻿import argparse
 import glob
+import hashlib
 import json
-from collections import defaultdict
-from dataclasses import dataclass
+import os
+import pickle
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
 from typing import Any
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_PARALLEL_LOAD_CHUNKSIZE = 16
+# Bump when GameRecord or _load_one change so stale pickles are not reused.
+_GAMES_CACHE_VERSION = 1
+_GAMES_CACHE_MAX_ENTRIES_PER_PLAYER = 8
+
 
 @dataclass
 class GameRecord:
@@ -15,10 +32,20 @@ class GameRecord:
     did_win: bool
     self_team: list[str]
     opponent_team: list[str]
+    opponent_team_lower: frozenset[str] = field(init=False)
     self_leads: list[str]
     self_back: list[str]
     self_tera: str | None
 
+    def __post_init__(self) -> None:
+        self.opponent_team_lower = frozenset(name.lower() for name in self.opponent_team)
+
+
+def _loads_json(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 def _to_rate(wins: int, total: int) -> dict[str, Any]:
     losses = total - wins
@@ -41,38 +68,125 @@ def _identify_sides(game: dict[str, Any], target_player: str) -> tuple[dict[str,
     return None
 
 
-def load_games(paths: list[str], target_player: str) -> list[GameRecord]:
-    games: list[GameRecord] = []
-    for path in paths:
-        with open(path, encoding="utf-8") as f:
-            payload = json.load(f)
+def _load_one(path: str, target_player: str) -> GameRecord | None:
+    with open(path, "rb") as f:
+        payload = _loads_json(f.read())
+
+    sides = _identify_sides(payload, target_player)
+    if not sides:
+        return None
+
+    self_side, opponent_side, did_win = sides
+    self_team = [sys.intern(name) for member in self_side.get("team", []) if (name := member.get("name"))]
+    opponent_team = [
+        sys.intern(name) for member in opponent_side.get("team", []) if (name := member.get("name"))
+    ]
+
+    return GameRecord(
+        source_file=path,
+        best_of_3_id=payload.get("best_of_3_id"),
+        best_of_3_game_number=payload.get("best_of_3_game_number"),
+        did_win=did_win,
+        self_team=self_team,
+        opponent_team=opponent_team,
+        self_leads=[sys.intern(name) for name in self_side.get("lead_pokemon", [])],
+        self_back=[sys.intern(name) for name in self_side.get("back_pokemon", [])],
+        self_tera=self_side.get("terastalized_pokemon"),
+    )
 
-        sides = _identify_sides(payload, target_player)
-        if not sides:
-            continue
 
-        self_side, opponent_side, did_win = sides
-        self_team = [member.get("name") for member in self_side.get("team", []) if member.get("name")]
-        opponent_team = [
-            member.get("name") for member in opponent_side.get("team", []) if member.get("name")
-        ]
-
-        games.append(
-            GameRecord(
-                source_file=path,
-                best_of_3_id=payload.get("best_of_3_id"),
-                best_of_3_game_number=payload.get("best_of_3_game_number"),
-                did_win=did_win,
-                self_team=self_team,
-                opponent_team=opponent_team,
-                self_leads=list(self_side.get("lead_pokemon", [])),
-                self_back=list(self_side.get("back_pokemon", [])),
-                self_tera=self_side.get("terastalized_pokemon"),
-            )
-        )
+def _reintern_names(game: GameRecord) -> GameRecord:
+    # Records returned from worker processes arrive with their own string copies.
+    game.self_team = [sys.intern(name) for name in game.self_team]
+    game.opponent_team = [sys.intern(name) for name in game.opponent_team]
+    game.self_leads = [sys.intern(name) for name in game.self_leads]
+    game.self_back = [sys.intern(name) for name in game.self_back]
+    return game
+
+
+def load_games(paths: list[str], target_player: str, jobs: int = 1) -> list[GameRecord]:
+    load = partial(_load_one, target_player=target_player)
+    if jobs <= 1:
+        results = map(load, paths)
+        return [game for game in results if game is not None]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(load, paths, chunksize=_PARALLEL_LOAD_CHUNKSIZE)
+        return [_reintern_names(game) for game in results if game is not None]
+
+
+def _games_cache_prefix(target_player: str) -> str:
+    # Hashed so any username is a safe filename.
+    return hashlib.blake2b(target_player.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _games_cache_path(paths: list[str], target_player: str, cache_dir: Path) -> Path:
+    stamps = sorted((os.path.abspath(p), os.stat(p).st_mtime_ns) for p in paths)
+    key_source = repr((_GAMES_CACHE_VERSION, target_player, stamps)).encode("utf-8")
+    key = hashlib.blake2b(key_source, digest_size=16).hexdigest()
+    return cache_dir / f"{_games_cache_prefix(target_player)}-{key}.pkl"
+
+
+def _read_games_cache(cache_path: Path) -> list[GameRecord] | None:
+    try:
+        with open(cache_path, "rb") as f:
+            games = pickle.load(f)
+    except Exception:  # Damaged pickles can raise almost anything.
+        return None
+    if not isinstance(games, list) or not all(isinstance(game, GameRecord) for game in games):
+        return None
+    return games
+
+
+def _prune_games_cache(cache_dir: Path, target_player: str) -> None:
+    entries = sorted(
+        cache_dir.glob(f"{_games_cache_prefix(target_player)}-*.pkl"),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for stale_path in entries[_GAMES_CACHE_MAX_ENTRIES_PER_PLAYER:]:
+        stale_path.unlink(missing_ok=True)
+
+
+def load_games_cached(
+    paths: list[str], target_player: str, cache_dir: Path, jobs: int = 1
+) -> list[GameRecord]:
+    if not paths:
+        return []
+
+    cache_path = _games_cache_path(paths, target_player, cache_dir)
+    games = _read_games_cache(cache_path)
+    if games is not None:
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return games
+
+    games = load_games(paths, target_player, jobs)
+    tmp_path: str | None = None
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+            pickle.dump(games, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        tmp_path = None
+        _prune_games_cache(cache_dir, target_player)
+    except OSError:
+        pass
+    finally:
+        if tmp_path is not None:
+            Path(tmp_path).unlink(missing_ok=True)
     return games
 
 
+def _default_cache_dir() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    base = Path(cache_home) if cache_home else Path.home() / ".cache"
+    return base / "winrate_analyzer"
+
+
 def compute_overall_game_winrate(games: list[GameRecord]) -> dict[str, Any]:
     wins = sum(1 for g in games if g.did_win)
     return _to_rate(wins, len(games))
@@ -119,14 +233,20 @@ def compute_bo3_vs_opponent_set_winrate(
     required = {name.lower() for name in required_opponent_pokemon}
     grouped = _group_bo3(games)
 
-    filtered: list[list[GameRecord]] = []
-    for match_games in grouped.values():
-        qualifies = any(
-            required.issubset({name.lower() for name in game.opponent_team})
-            for game in match_games
-        )
-        if qualifies:
-            filtered.append(match_games)
+    # A match qualifies when one of its games is in every required posting list.
+    postings: dict[str, set[tuple[str, int]]] = defaultdict(set)
+    for bo3_id, match_games in grouped.items():
+        for game_index, game in enumerate(match_games):
+            for name in game.opponent_team_lower:
+                postings[name].add((bo3_id, game_index))
+
+    if required:
+        required_postings = sorted((postings.get(name, set()) for name in required), key=len)
+        qualifying_ids = {bo3_id for bo3_id, _ in set.intersection(*required_postings)}
+    else:
+        qualifying_ids = set(grouped)
+
+    filtered = [match_games for bo3_id, match_games in grouped.items() if bo3_id in qualifying_ids]
 
     decided: list[bool] = []
     undecided_count = 0
@@ -146,47 +266,44 @@ def compute_bo3_vs_opponent_set_winrate(
 
 
 def compute_game_winrate_by_brought_pokemon(games: list[GameRecord]) -> dict[str, dict[str, Any]]:
-    counts: dict[str, dict[str, int]] = defaultdict(lambda: {"wins": 0, "total": 0})
+    wins: Counter[str] = Counter()
+    totals: Counter[str] = Counter()
     for game in games:
-        brought = set(game.self_leads + game.self_back)
+        brought = {*game.self_leads, *game.self_back}
         for pokemon in brought:
-            counts[pokemon]["total"] += 1
+            totals[pokemon] += 1
             if game.did_win:
-                counts[pokemon]["wins"] += 1
+                wins[pokemon] += 1
 
-    return {
-        pokemon: _to_rate(stats["wins"], stats["total"])
-        for pokemon, stats in sorted(counts.items())
-    }
+    return {pokemon: _to_rate(wins[pokemon], totals[pokemon]) for pokemon in sorted(totals)}
 
 
 def compute_game_winrate_by_lead_pair(games: list[GameRecord]) -> dict[str, dict[str, Any]]:
-    counts: dict[str, dict[str, int]] = defaultdict(lambda: {"wins": 0, "total": 0})
+    wins: Counter[str] = Counter()
+    totals: Counter[str] = Counter()
     for game in games:
         if not game.self_leads:
             continue
         lead_pair = " + ".join(sorted(game.self_leads))
-        counts[lead_pair]["total"] += 1
+        totals[lead_pair] += 1
         if game.did_win:
-            counts[lead_pair]["wins"] += 1
+            wins[lead_pair] += 1
 
-    return {
-        lead_pair: _to_rate(stats["wins"], stats["total"])
-        for lead_pair, stats in sorted(counts.items())
-    }
+    return {lead_pair: _to_rate(wins[lead_pair], totals[lead_pair]) for lead_pair in sorted(totals)}
 
 
 def compute_game_winrate_by_tera(games: list[GameRecord]) -> dict[str, dict[str, Any]]:
-    counts: dict[str, dict[str, int]] = defaultdict(lambda: {"wins": 0, "total": 0})
+    wins: Counter[str] = Counter()
+    totals: Counter[str] = Counter()
     for game in games:
         tera_key = game.self_tera if game.self_tera else "No Terastallization"
-        counts[tera_key]["total"] += 1
+        totals[tera_key] += 1
         if game.did_win:
-            counts[tera_key]["wins"] += 1
+            wins[tera_key] += 1
 
     return {
-        tera_target: _to_rate(stats["wins"], stats["total"])
-        for tera_target, stats in sorted(counts.items())
+        tera_target: _to_rate(wins[tera_target], totals[tera_target])
+        for tera_target in sorted(totals)
     }
 
 
@@ -236,13 +353,42 @@ def parse_args() -> argparse.Namespace:
         "--output",
         help="Optional output path for analysis JSON.",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for loading input files; 1 loads them in-process.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help=(
+            "Directory for cached loaded games, reused across runs on the same files "
+            "(default: $XDG_CACHE_HOME/winrate_analyzer or ~/.cache/winrate_analyzer)."
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always re-read the input files and leave the cache untouched.",
+    )
+    args = parser.parse_args()
+    if args.cache_dir is None and not args.no_cache:
+        try:
+            args.cache_dir = _default_cache_dir()
+        except RuntimeError:
+            parser.error("could not determine a cache directory; pass --cache-dir or --no-cache")
+    return args
 
 
 def main() -> None:
     args = parse_args()
     paths = sorted(glob.glob(args.input_glob))
-    games = load_games(paths, args.player)
+    if args.no_cache:
+        games = load_games(paths, args.player, args.jobs)
+    else:
+        games = load_games_cached(paths, args.player, args.cache_dir, args.jobs)
 
     analysis = {
         "player": args.player,